@@ -38,3 +38,15 @@ class SigmaError(Error):
     def __init__(self, expression, message):
         self.expression = expression
         self.message = message
+
+
+class StateNotDeclaredError(SigmaError):
+    """Exception raised when a state used by the automata is not in Q."""
+
+    pass
+
+
+class SymbolNotDeclaredError(SigmaError):
+    """Exception raised when a symbol used by the automata is not in sigma."""
+
+    pass
@@ -3,37 +3,271 @@ from __future__ import (
     annotations,
 )
 from automathon.errors.errors import (
+    InputError,
     SigmaError,
+    StateNotDeclaredError,
+    SymbolNotDeclaredError,
 )
 from automathon.utils.utils import (
-    list_map,
+    cache_field,
+    dot_source,
+    reduce_fields,
+    render_dot,
 )
 from collections import (
-    deque,
+    OrderedDict,
 )
 from dataclasses import (
     dataclass,
 )
-from graphviz import (
-    Digraph,
+from functools import (
+    lru_cache,
+    partial,
+)
+from itertools import (
+    chain,
+)
+from threading import (
+    Lock,
 )
 from typing import (
+    Any,
     Callable,
+    Iterable,
 )
-import itertools
+import operator
+import struct
+
+
+@dataclass(frozen=True, slots=True)
+class _DFATables:
+    """Integer encoding of a DFA used by the simulation.
+
+    States and symbols are numbered in sorted order, states and symbols map
+    the ids back to the names. rows[q][a] is the state reached from q
+    consuming a, or -1 when it's undefined. byte_symbols, when present, is a
+    bytes.translate table from latin-1 characters to symbol ids.
+
+    A sink is a state with no transition to another state. accept_rows is rows
+    with the transitions into a sink t stored as -2 - t, and sink_loops[t]
+    holds the symbols t loops on, so the simulation can settle the rest of
+    the input once it gets there.
+    """
+
+    states: list[str]
+    symbols: list[str]
+    state_id: dict[str, int]
+    symbol_id: dict[str, int]
+    rows: list[list[int]]
+    finals: list[bool]
+    byte_symbols: bytes | None
+    accept_rows: list[list[int]]
+    sink_loops: list[frozenset[int] | None]
+
+
+@dataclass(frozen=True, slots=True)
+class _PairedDFAs:
+    """Pairs of states of two DFAs reachable from the pair of initial states.
+
+    names[i] is the name of the i-th pair in BFS order, delta holds the
+    transitions between those names and finals[i] tells whether each state
+    of the i-th pair is final, so every product operation only has to pick
+    its final states.
+    """
+
+    names: list[str]
+    q: frozenset[str]
+    delta: dict[str, dict[str, str]]
+    finals: list[tuple[bool, bool]]
+
+
+class _PairedCache:
+    """LRU cache of the pairs of states explored by the products of DFAs.
+
+    Entries are keyed by the alphabet and the ids of the transition tables of
+    both DFAs, and keep those tables alive so the ids can't be reused. Each
+    entry takes as many rows as its pairs and both tables have, the least
+    recently used entries are dropped once there are more than max_rows.
+    """
+
+    __slots__ = ("entries", "rows", "max_rows", "lock")
+
+    def __init__(self, max_rows: int):
+        self.entries: OrderedDict[
+            tuple[frozenset[str], int, int],
+            tuple[_DFATables, _DFATables, _PairedDFAs],
+        ] = OrderedDict()
+        self.rows = 0
+        self.max_rows = max_rows
+        self.lock = Lock()
+
+    def get(
+        self,
+        sigma: frozenset[str],
+        tables_a: _DFATables,
+        tables_b: _DFATables,
+    ) -> _PairedDFAs | None:
+        key = (sigma, id(tables_a), id(tables_b))
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            self.entries.move_to_end(key)
+
+        return entry[2]
+
+    def put(
+        self,
+        sigma: frozenset[str],
+        tables_a: _DFATables,
+        tables_b: _DFATables,
+        paired: _PairedDFAs,
+    ) -> None:
+        key = (sigma, id(tables_a), id(tables_b))
+        rows = len(tables_a.rows) + len(tables_b.rows) + len(paired.names)
+
+        if rows > self.max_rows:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                return
+
+            while self.rows + rows > self.max_rows:
+                _, (old_a, old_b, old) = self.entries.popitem(last=False)
+                self.rows -= len(old_a.rows) + len(old_b.rows) + len(old.names)
+
+            self.entries[key] = (tables_a, tables_b, paired)
+            self.rows += rows
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.rows = 0
+
+
+# Marks the bytes that aren't a symbol in _DFATables.byte_symbols
+_NO_SYMBOL = b"\xff"
+
+# Number of accept results remembered per DFA, least recently used first out,
+# only strings up to _ACCEPT_MEMO_LENGTH symbols long are remembered
+_ACCEPT_MEMO_SIZE = 1024
+_ACCEPT_MEMO_LENGTH = 64
+
+# Pairs of states explored by the products between DFAs, shared by every DFA
+# and holding at most _PAIRED_CACHE_ROWS rows between all its entries
+_PAIRED_CACHE_ROWS = 1 << 15
+_PAIRED_CACHE = _PairedCache(_PAIRED_CACHE_ROWS)
+
+# Layout of DFA.to_bytes: a header with the magic, the format version, the
+# number of states and symbols and the id of the initial state, followed by
+# the names as length-prefixed UTF-8, the rows and the final states bitmap
+_PACKED_MAGIC = b"AMFA"
+_PACKED_VERSION = 1
+_PACKED_HEADER = struct.Struct("<4sIIII")
+_PACKED_LENGTH = struct.Struct("<I")
+
+
+class _RefinablePartition:
+    """Partition of the ids 0..n-1 that can be refined by marking ids.
+
+    Each set is a contiguous slice elements[first[s]:past[s]], the marked ids
+    of a set are kept at the front of its slice. split() cuts every set with
+    marked ids in two, keeping the larger part as s and numbering the smaller
+    one as a new set, as in Valmari and Lehtinen's minimization.
+    """
+
+    __slots__ = (
+        "elements",
+        "location",
+        "set_of",
+        "first",
+        "past",
+        "marked",
+        "touched",
+    )
+
+    def __init__(self, sets: list[list[int]]):
+        self.elements = [e for elements in sets for e in elements]
+        self.location = [0] * len(self.elements)
+        self.set_of = [0] * len(self.elements)
+        self.first: list[int] = []
+        self.past: list[int] = []
+        self.marked: list[int] = []
+        self.touched: list[int] = []
+
+        for i, e in enumerate(self.elements):
+            self.location[e] = i
+
+        for s, elements in enumerate(sets):
+            start = self.past[-1] if self.past else 0
+            self.first.append(start)
+            self.past.append(start + len(elements))
+            self.marked.append(0)
+            for e in elements:
+                self.set_of[e] = s
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def members(self, s: int) -> list[int]:
+        return self.elements[self.first[s] : self.past[s]]
+
+    def mark(self, e: int) -> None:
+        s = self.set_of[e]
+        i = self.location[e]
+        j = self.first[s] + self.marked[s]
+        other = self.elements[j]
+
+        self.elements[i] = other
+        self.location[other] = i
+        self.elements[j] = e
+        self.location[e] = j
+
+        if not self.marked[s]:
+            self.touched.append(s)
+        self.marked[s] += 1
+
+    def split(self) -> None:
+        while self.touched:
+            s = self.touched.pop()
+            j = self.first[s] + self.marked[s]
+            self.marked[s] = 0
+
+            if j == self.past[s]:
+                continue
 
+            if j - self.first[s] <= self.past[s] - j:
+                self.first.append(self.first[s])
+                self.past.append(j)
+                self.first[s] = j
+            else:
+                self.first.append(j)
+                self.past.append(self.past[s])
+                self.past[s] = j
+            self.marked.append(0)
 
-@dataclass
+            new_set = len(self.first) - 1
+            for e in self.members(new_set):
+                self.set_of[e] = new_set
+
+
+@dataclass(frozen=True, slots=True)
 class DFA:
     """A class used to represent a Deterministic Finite Automaton (DFA).
 
+    The DFA is immutable: q, sigma and f are stored as frozensets, so the
+    automata built from it (e.g. its complement) can share them safely.
+
     Attributes
     ----------
-    q : set[str]
+    q : frozenset[str]
         Set of strings where each string represents a state.
         Example: q = {'q0', 'q1', 'q2'}
 
-    sigma : set[str]
+    sigma : frozenset[str]
         Set of strings that represents the alphabet.
         Example: sigma = {'0', '1'}
 
@@ -50,7 +284,7 @@ class DFA:
         processed (initial_state ∈ q / initial_state in q).
         Example: initial_state = 'q0'
 
-    f : set[str]
+    f : frozenset[str]
         Set of strings that represent the final state/states of Q (f ⊆ Q).
         Example: f = {'q0'}
 
@@ -62,6 +296,15 @@ class DFA:
     accept(S : str) -> bool
         Returns True if the given string S is accepted by the DFA.
 
+    accept_many(strings : Iterable[str]) -> list[bool]
+        Returns, in order, whether each of the given strings is accepted.
+
+    clear_cache() -> None
+        Drops the values computed from the DFA and kept for reuse.
+
+    clear_product_cache() -> None
+        Drops the pairs of states shared by the product operations.
+
     complement() -> DFA
         Returns the complement of the DFA.
 
@@ -83,19 +326,31 @@ class DFA:
     symmetric_difference(m: DFA) -> DFA
         Given a DFA m, returns the symmetric difference automaton.
 
+    to_bytes() -> bytes
+        Returns the DFA packed in a compact binary format.
+
+    from_bytes(data : bytes) -> DFA
+        Returns the DFA packed in data by to_bytes.
+
     view(
         file_name : str, node_attr : dict[str, str] | None, edge_attr : dict[str, str] | None
     ) -> None
         Using the graphviz library, it creates a visual representation of the DFA
         and saves it as a .png file with the name file_name"""
 
-    q: set[str]
-    sigma: set[str]
+    q: frozenset[str]
+    sigma: frozenset[str]
     delta: dict[str, dict[str, str]]
     initial_state: str
-    f: set[str]
+    f: frozenset[str]
+    # Values derived from the automaton, computed lazily on first use
+    _cache: dict[str, Any] = cache_field()
 
-    def accept(self, string: str) -> bool:
+    def __post_init__(self) -> None:
+        for name in ("q", "sigma", "f"):
+            object.__setattr__(self, name, frozenset(getattr(self, name)))
+
+    def accept(self, string: str | bytes) -> bool:
         """Returns True if the given string is accepted by the DFA
 
         The string will be accepted if ∀a · a ∈ string ⇒ a ∈ sigma, which means
@@ -104,80 +359,268 @@ class DFA:
 
         Parameters
         - - - - - - - - - - - - - - - - - -
-        S : str
-          A string that the DFA will try to process.
+        S : str | bytes
+          A string that the DFA will try to process. Bytes-like inputs are
+          read as latin-1 characters, one per byte.
         """
 
-        # Basic Idea: Search through states (delta) in the DFA, from the initial state to the final states
+        accept = self._cache.get("accept")
+
+        if accept is None:
+            accept = self.__build_accept()
+
+        return accept(string)
+
+    def accept_many(self, strings: Iterable[str | bytes]) -> list[bool]:
+        """Returns, in order, whether each of the given strings is accepted
 
-        ans = False
+        The integer encoding of the DFA is looked up once for the whole
+        batch, which suits running the same DFA over many short inputs.
+
+        Parameters
+        - - - - - - - - - - - - - - - - - -
+        strings : Iterable[str | bytes]
+          Strings that the DFA will try to process, as in accept.
+        """
+        accept = self._cache.get("accept")
 
-        # queue -> states from i to last character in S | (index, state)
-        q: deque[tuple[int, str]] = deque()
-        q.append([0, self.initial_state])
+        if accept is None:
+            accept = self.__build_accept()
 
-        while q and not ans:
-            idx, state = q.popleft()
+        return list(map(accept, strings))
 
-            if idx == len(string) and state in self.f:
-                ans = True
-            elif idx < len(string):
-                # Search through states
-                for a, state in self.delta[state].items():
-                    # transition: ('1', 'q0')
-                    if string[idx] == a:
-                        q.append([idx + 1, state])
+    def __reduce__(self) -> tuple[type, tuple[Any, ...]]:
+        return reduce_fields(self)
 
-        return ans
+    def clear_cache(self) -> None:
+        """Drops everything computed from the DFA and kept for reuse
+
+        The integer tables and the memoized accept results assume delta is
+        not modified in place, call this after doing so.
+        """
+        self._cache.clear()
+
+    @staticmethod
+    def clear_product_cache() -> None:
+        """Drops the pairs of states explored by the product operations
+
+        An operation over two DFAs reuses the pairs explored by any earlier
+        one over the same DFAs and only builds a new DFA from them. The
+        least recently used pairs are dropped once there are too many.
+        """
+        _PAIRED_CACHE.clear()
+
+    def __build_accept(self) -> Callable[[str | bytes], bool]:
+        tables = self.__get_tables()
+        simulate = partial(
+            self.__simulate, tables, tables.state_id[self.initial_state]
+        )
+        memo = lru_cache(_ACCEPT_MEMO_SIZE)(simulate)
+
+        def accept(string: str | bytes) -> bool:
+            # Short strings go through a LRU memo of the results, longer ones
+            # and the unhashable bytes-like inputs are simulated every time
+            if (
+                type(string) in (str, bytes)
+                and len(string) <= _ACCEPT_MEMO_LENGTH
+            ):
+                return memo(string)
+
+            return simulate(string)
+
+        self._cache["accept"] = accept
+
+        return accept
+
+    @staticmethod
+    def __simulate(tables: _DFATables, state: int, string: str | bytes) -> bool:
+        # Basic Idea: Follow the only transition available for each character
+        # from the given state over the integer encoding of the DFA, -1 being
+        # the dead state
+        rows = tables.accept_rows
+
+        if tables.byte_symbols is None:
+            if not isinstance(string, str):
+                string = bytes(string).decode("latin-1")
+
+            # Reject characters outside the alphabet before walking the table
+            if not tables.symbol_id.keys() >= set(string):
+                return False
+
+            symbols = map(tables.symbol_id.__getitem__, string)
+        else:
+            if isinstance(string, str):
+                try:
+                    string = string.encode("latin-1")
+                except UnicodeEncodeError:
+                    # There are characters that can't be in the alphabet
+                    return False
+            elif not isinstance(string, (bytes, bytearray)):
+                string = bytes(string)
+
+            symbols = string.translate(tables.byte_symbols)
+
+            if _NO_SYMBOL in symbols:
+                return False
+
+        symbols = iter(symbols)
+
+        for a in symbols:
+            state = rows[state][a]
+
+            if state < 0:
+                if state == -1:
+                    return False
+
+                # Got to a sink, the string is accepted if it's final and it
+                # loops on every remaining symbol
+                state = -2 - state
+
+                return tables.finals[state] and tables.sink_loops[
+                    state
+                ].issuperset(symbols)
+
+        return tables.finals[state]
+
+    def __get_tables(self) -> _DFATables:
+        tables = self._cache.get("tables")
+
+        if tables is None:
+            tables = self._cache["tables"] = self.__build_tables()
+
+        return tables
+
+    def __build_tables(self) -> _DFATables:
+        states = sorted(
+            self.q
+            | self.delta.keys()
+            | {self.initial_state}
+            | {
+                state
+                for transitions in self.delta.values()
+                for state in transitions.values()
+            }
+        )
+        symbols = sorted(
+            self.sigma
+            | {s for transitions in self.delta.values() for s in transitions}
+        )
+        state_id = {state: i for i, state in enumerate(states)}
+        symbol_id = {symbol: a for a, symbol in enumerate(symbols)}
+        n_symbols = len(symbols)
+
+        rows = [[-1] * n_symbols for _ in states]
+
+        for state, transitions in self.delta.items():
+            row = rows[state_id[state]]
+            for s, next_state in transitions.items():
+                row[symbol_id[s]] = state_id[next_state]
+
+        finals = [state in self.f for state in states]
+
+        sink_loops = [
+            frozenset(a for a, t in enumerate(row) if t == q)
+            if all(t in (q, -1) for t in row)
+            else None
+            for q, row in enumerate(rows)
+        ]
+        accept_rows = [
+            [t if t < 0 or sink_loops[t] is None else -2 - t for t in row]
+            for row in rows
+        ]
+
+        # Map each byte to the id of its single character symbol when every
+        # such symbol is a latin-1 character and the ids fit in a byte
+        byte_symbols = None
+        single_char = [s for s in symbols if len(s) == 1]
+
+        if n_symbols < _NO_SYMBOL[0] and all(ord(s) < 256 for s in single_char):
+            lut = bytearray(_NO_SYMBOL * 256)
+            for s in single_char:
+                lut[ord(s)] = symbol_id[s]
+            byte_symbols = bytes(lut)
+
+        return _DFATables(
+            states,
+            symbols,
+            state_id,
+            symbol_id,
+            rows,
+            finals,
+            byte_symbols,
+            accept_rows,
+            sink_loops,
+        )
 
     def is_valid(self) -> bool:
         """Returns True if the DFA is a valid automata"""
+        if self._cache.get("valid"):
+            return True
+
         sigma_error_msg_not_q = "Is not declared in Q"
         sigma_error_msg_not_sigma = "Is not declared in sigma"
 
         # Validate if the initial state is in the set Q
         if self.initial_state not in self.q:
-            raise SigmaError(self.initial_state, sigma_error_msg_not_q)
+            raise StateNotDeclaredError(
+                self.initial_state, sigma_error_msg_not_q
+            )
 
         # Validate if the delta transitions are in the set Q
-        for d in self.delta:
-            if d not in self.q:
-                raise SigmaError(d, sigma_error_msg_not_q)
+        if not self.delta.keys() <= self.q:
+            raise StateNotDeclaredError(
+                next(iter(self.delta.keys() - self.q)), sigma_error_msg_not_q
+            )
+
+        # Validate the symbols and destinations of every transition, each
+        # superset check is a single pass in C over all the transitions
+        q, sigma = self.q, self.sigma
+        if not sigma.issuperset(chain.from_iterable(self.delta.values())):
+            s = next(
+                s
+                for transitions in self.delta.values()
+                for s in transitions
+                if s not in sigma
+            )
+            raise SymbolNotDeclaredError(s, sigma_error_msg_not_sigma)
 
-            # Validate if the d transitions are valid
-            for s in self.delta[d]:
-                if s not in self.sigma:
-                    raise SigmaError(s, sigma_error_msg_not_sigma)
-                elif self.delta[d][s] not in self.q:
-                    raise SigmaError(self.delta[d][s], sigma_error_msg_not_q)
+        destinations = chain.from_iterable(
+            map(dict.values, self.delta.values())
+        )
+        if not q.issuperset(destinations):
+            state = next(
+                t
+                for transitions in self.delta.values()
+                for t in transitions.values()
+                if t not in q
+            )
+            raise StateNotDeclaredError(state, sigma_error_msg_not_q)
 
         # Validate if the final state are in Q
-        for f in self.f:
-            if f not in self.q:
-                raise SigmaError(f, sigma_error_msg_not_q)
+        if not self.f <= self.q:
+            raise StateNotDeclaredError(
+                next(iter(self.f - self.q)), sigma_error_msg_not_q
+            )
 
         # None of the above cases failed then this DFA is valid
+        self._cache["valid"] = True
         return True
 
     def complement(self) -> "DFA":
         """Returns the complement of the DFA."""
-        q = self.q
-        sigma = self.sigma
-        delta = self.delta
-        initial_state = self.initial_state
-        f = {state for state in self.q if state not in self.f}
-
-        return DFA(q, sigma, delta, initial_state, f)
+        return DFA(
+            self.q, self.sigma, self.delta, self.initial_state, self.q - self.f
+        )
 
     def get_nfa(self):
         from automathon.finite_automata.nfa import NFA
 
         """Convert the actual DFA to NFA class and return it's conversion"""
-        q = self.q.copy()
+        q = set(self.q)
         delta = dict()
         initial_state = self.initial_state
-        f = self.f.copy()
-        sigma = self.sigma
+        f = set(self.f)
+        sigma = set(self.sigma)
 
         for state, transition in self.delta.items():
             # state : str, transition : dict(sigma, Q)
@@ -191,225 +634,538 @@ class DFA:
         return NFA(q, sigma, delta, initial_state, f)
 
     def product(self, m: "DFA") -> "DFA":
-        initial_state = str((self.initial_state, m.initial_state))
-        cross_product_states = {
-            (q_1, q_2) for q_1, q_2 in itertools.product(self.q, m.q)
-        }
-        q = {str(state) for state in cross_product_states}
-        sigma = self.sigma & m.sigma
-        f = {
-            str((q_1, q_2))
-            for (q_1, q_2) in cross_product_states
-            if q_1 in self.f and q_2 in m.f
-        }
-        delta: dict[str, dict[str, str]] = dict()
-
-        for q_1, q_2 in cross_product_states:
-            actual_state = str((q_1, q_2))
-            delta[actual_state] = dict()
-            common_sigma = filter(
-                lambda x: x in sigma,
-                set(self.delta[q_1].keys()) | set(m.delta[q_2].keys()),
-            )
+        """Given a DFA returns the product automaton
 
-            for a in common_sigma:
-                delta[actual_state][a] = str(
-                    (self.delta[q_1][a], m.delta[q_2][a])
-                )
-
-        return DFA(q, sigma, delta, initial_state, f)
+        Only the pairs of states reachable from the pair of initial states
+        are built, over the symbols both DFAs have in common. The pairs are
+        kept for the other operations over the same DFAs, see
+        clear_product_cache.
+        """
+        return self.__reachable_product(m, self.sigma & m.sigma, operator.and_)
 
     def union(self, m: "DFA") -> "DFA":
         """Given a DFA  returns the union automaton"""
-        return self.__binary_operation(
-            m, lambda a, f, b, f_m: a in f or b in f_m
-        )
+        return self.__binary_operation(m, operator.or_)
 
     def intersection(self, m: "DFA") -> "DFA":
         """Given a DFA  returns the intersection automaton"""
-        return self.__binary_operation(
-            m, lambda a, f, b, f_m: a in f and b in f_m
-        )
+        return self.__binary_operation(m, operator.and_)
 
     def difference(self, m: "DFA") -> "DFA":
         """Given a DFA  returns the difference automaton"""
-        return self.__binary_operation(
-            m, lambda a, f, b, f_m: a in f and b not in f_m
-        )
+        # On booleans a > b holds only for a and not b
+        return self.__binary_operation(m, operator.gt)
 
     def symmetric_difference(self, m: "DFA") -> "DFA":
         """Given a DFA  returns the symmetric difference automaton"""
-        return self.__binary_operation(
-            m,
-            lambda a, f, b, f_m: (a in f and b not in f_m)
-            or (a not in f and b in f_m),
-        )
+        return self.__binary_operation(m, operator.xor)
 
     def __binary_operation(
         self,
         m: "DFA",
-        operation: Callable[[str, set[str], str, set[str]], bool],
+        operation: Callable[[bool, bool], bool],
     ) -> "DFA":
-        new_q_list: list[tuple[str, str]] = []
-
-        initial_state = str((self.initial_state, m.initial_state))
-        delta: dict[str, dict[str, str]] = dict()
-        sigma: set[str] = self.sigma.copy()
-        f: set[str] = set()
-
         # Check if both sigmas are the same
         if self.sigma != m.sigma:
             raise SigmaError(
                 self.sigma, "Sigma from both DFAs must be the same"
             )
 
-        queue: deque[tuple[str, str]] = deque()
-        queue.append((self.initial_state, m.initial_state))
+        return self.__reachable_product(m, self.sigma, operation)
 
-        while queue:
-            a, b = queue.popleft()
-
-            new_q_list.append((a, b))
+    def __reachable_product(
+        self,
+        m: "DFA",
+        sigma: frozenset[str],
+        operation: Callable[[bool, bool], bool],
+    ) -> "DFA":
+        # The pairs don't depend on the operation, they are explored once for
+        # all the operations over the same DFAs
+        tables_a = self.__get_tables()
+        tables_b = m.__get_tables()
+        paired = _PAIRED_CACHE.get(sigma, tables_a, tables_b)
+
+        if paired is None:
+            paired = self.__pair(m, sigma, tables_a, tables_b)
+            _PAIRED_CACHE.put(sigma, tables_a, tables_b, paired)
+
+        names = paired.names
+        # operation combines whether each side of the pair is final
+        f = frozenset(
+            names[i]
+            for i, (final_a, final_b) in enumerate(paired.finals)
+            if operation(final_a, final_b)
+        )
+        # Every product gets its own rows, q and sigma are frozen and shared
+        delta = {state: dict(row) for state, row in paired.delta.items()}
 
-            if operation(a, self.f, b, m.f):
-                f.add(str((a, b)))
+        return DFA(paired.q, sigma, delta, names[0], f)
 
-            common_transitions = self.delta[a].keys() & m.delta[b].keys()
+    def __pair(
+        self,
+        m: "DFA",
+        sigma: frozenset[str],
+        tables_a: _DFATables,
+        tables_b: _DFATables,
+    ) -> _PairedDFAs:
+        # Walk both transition tables, pairing the symbols by name
+        rows_a = tables_a.rows
+        rows_b = tables_b.rows
+        shared = [
+            (s, x, tables_b.symbol_id[s])
+            for x, s in enumerate(tables_a.symbols)
+            if s in sigma and s in tables_b.symbol_id
+        ]
+
+        # Reachable pairs are numbered in discovery order, the list doubles
+        # as the BFS queue since pairs are only ever appended to it
+        pairs: list[tuple[int, int]] = [
+            (
+                tables_a.state_id[self.initial_state],
+                tables_b.state_id[m.initial_state],
+            )
+        ]
+        pair_id: dict[tuple[int, int], int] = {pairs[0]: 0}
+        transitions: list[dict[str, int]] = []
 
-            for s in common_transitions:
-                new_q = (self.delta[a][s], m.delta[b][s])
+        for a, b in pairs:
+            row: dict[str, int] = dict()
 
-                if new_q not in new_q_list:
-                    queue.append(new_q)
-                    new_q_list.append(new_q)
+            for s, x, y in shared:
+                next_a = rows_a[a][x]
+                next_b = rows_b[b][y]
+                if next_a < 0 or next_b < 0:
+                    continue
 
-                if str((a, b)) in delta:
-                    delta[str((a, b))][s] = str(new_q)
-                else:
-                    delta[str((a, b))] = {s: str(new_q)}
+                new_q = (next_a, next_b)
+                new_id = pair_id.get(new_q)
 
-        return DFA(set(map(str, new_q_list)), sigma, delta, initial_state, f)
+                if new_id is None:
+                    new_id = pair_id[new_q] = len(pairs)
+                    pairs.append(new_q)
 
-    def minimize(self) -> "DFA":
-        """Minimize the automata and return the minimized version"""
-        p_k: set[frozenset[str]] = set(
-            [frozenset([*self.q.difference(self.f)]), frozenset([*self.f])]
-        )
-        p_prev: set[frozenset[str]] = set()
+                row[s] = new_id
 
-        while p_k != p_prev:
-            states_idx: dict[str, int] = self.__states_idx_table(p_k)
-            new_p_k: list[set[str]] = []
+            transitions.append(row)
 
-            for p_states in p_k:
-                p_states_lst = list(p_states)
-                new_p_k.append({p_states_lst[0]})
+        # Pairs are named after their discovery order, q0 being the initial
+        # one, so names stay short however deep the products are nested
+        names = [f"q{i}" for i in range(len(pairs))]
+        delta = {
+            names[i]: {s: names[j] for s, j in row.items()}
+            for i, row in enumerate(transitions)
+        }
+        finals_a = tables_a.finals
+        finals_b = tables_b.finals
+        finals = [(finals_a[a], finals_b[b]) for a, b in pairs]
 
-                for i in range(1, len(p_states_lst)):
-                    was_added = False
-                    p_i_sigma = set(self.delta[p_states_lst[i]].keys())
+        return _PairedDFAs(names, frozenset(names), delta, finals)
 
-                    new_p_k, was_added = self.__define_group_ith_element(
-                        i, new_p_k, p_i_sigma, p_states_lst, states_idx
-                    )
+    def minimize(self) -> "DFA":
+        """Minimize the automata and return the minimized version
+
+        Uses Hopcroft's partition refinement, O(|sigma| · |Q| · log |Q|), or
+        Valmari and Lehtinen's, O(|delta| · log |Q|), when most transitions
+        are missing. Either way the transition tables it works on take
+        O(|sigma| · |Q|) to build, as does the result. Missing transitions go
+        to an implicit dead state, the states equivalent to it are merged into
+        a single state when the DFA is complete, so the result is complete
+        too, and dropped along with the transitions into them when it's
+        partial. The result is computed once and reused in later calls.
+        """
+        minimized = self._cache.get("minimized")
+
+        if minimized is None:
+            minimized = self._cache["minimized"] = self.__minimize()
+
+        return minimized
+
+    def __minimize(self) -> "DFA":
+        tables = self.__get_tables()
+        n_transitions = sum(map(len, self.delta.values()))
+
+        # Hopcroft's refinement works on the completed DFA, which is mostly
+        # transitions to the dead state when delta is sparse
+        if 2 * n_transitions < len(tables.states) * len(tables.symbols):
+            block_of = self.__refine_partial(tables)
+        else:
+            block_of = self.__refine_complete(tables)
+
+        return self.__build_minimized(tables, block_of, len(tables.states))
+
+    def __refine_partial(self, tables: _DFATables) -> list[int]:
+        # Valmari and Lehtinen's refinement, O(m · log n) on the m defined
+        # transitions. Only the reachable states that can reach a final state
+        # are refined, the rest share the dead state's block
+        n = len(tables.states)
+        sources: list[int] = []
+        labels: list[int] = []
+        targets: list[int] = []
+        for state, transitions in self.delta.items():
+            q = tables.state_id[state]
+            for s, next_state in transitions.items():
+                sources.append(q)
+                labels.append(tables.symbol_id[s])
+                targets.append(tables.state_id[next_state])
+
+        incoming: list[list[int]] = [[] for _ in range(n)]
+        for t, target in enumerate(targets):
+            incoming[target].append(t)
+
+        reachable = [False] * n
+        for q in self.__get_reachable():
+            reachable[q] = True
+
+        live = [False] * n
+        stack = [q for q in range(n) if tables.finals[q] and reachable[q]]
+        for q in stack:
+            live[q] = True
+        while stack:
+            for t in incoming[stack.pop()]:
+                q = sources[t]
+                if reachable[q] and not live[q]:
+                    live[q] = True
+                    stack.append(q)
+
+        # The ids in the partition of states are positions in live_states
+        live_states = [q for q in range(n) if live[q]]
+        position = [0] * n
+        for i, q in enumerate(live_states):
+            position[q] = i
+
+        blocks = _RefinablePartition([list(range(len(live_states)))])
+        for i, q in enumerate(live_states):
+            if tables.finals[q]:
+                blocks.mark(i)
+        blocks.split()
+
+        # Transitions between live states, grouped by symbol
+        by_label: list[list[int]] = [[] for _ in tables.symbols]
+        live_transitions: list[int] = []
+        for t in range(len(targets)):
+            if live[sources[t]] and live[targets[t]]:
+                by_label[labels[t]].append(len(live_transitions))
+                live_transitions.append(t)
+        cords = _RefinablePartition([group for group in by_label if group])
+
+        into: list[list[int]] = [[] for _ in live_states]
+        for i, t in enumerate(live_transitions):
+            into[position[targets[t]]].append(i)
+
+        # Every new block splits the cords by the block their targets are in,
+        # every new cord splits the blocks by the sources of its transitions
+        b, c = 1, 0
+        while c < len(cords):
+            for i in cords.members(c):
+                blocks.mark(position[sources[live_transitions[i]]])
+            blocks.split()
+            c += 1
+
+            while b < len(blocks):
+                for q in blocks.members(b):
+                    for i in into[q]:
+                        cords.mark(i)
+                cords.split()
+                b += 1
+
+        dead_block = len(blocks)
+        block_of = [dead_block] * (n + 1)
+        for i, q in enumerate(live_states):
+            block_of[q] = blocks.set_of[i]
+
+        return block_of
+
+    def __refine_complete(self, tables: _DFATables) -> list[int]:
+        inverse = self.__get_inverse()
+        n_symbols = len(tables.symbol_id)
+        n = len(tables.state_id)
+
+        # The dead state n completes the DFA
+        final = {q for q in range(n) if tables.finals[q]}
+        non_final = set(range(n + 1)) - final
+        blocks = [block for block in (final, non_final) if block]
+        block_of = [0] * (n + 1)
+        for i, block in enumerate(blocks):
+            for q in block:
+                block_of[q] = i
+
+        waiting: set[tuple[int, int]] = set()
+        if len(blocks) == 2:
+            smaller = 0 if len(final) <= len(non_final) else 1
+            waiting = {(smaller, a) for a in range(n_symbols)}
+
+        while waiting:
+            splitter_id, a = waiting.pop()
+
+            # Predecessors of the splitter, grouped by the block they are in
+            touched: dict[int, set[int]] = dict()
+            inverse_a = inverse[a]
+            for t in blocks[splitter_id]:
+                for q in inverse_a[t]:
+                    touched.setdefault(block_of[q], set()).add(q)
+
+            for y, inside in touched.items():
+                if len(inside) == len(blocks[y]):
+                    continue
+
+                blocks[y] -= inside
+                new_id = len(blocks)
+                blocks.append(inside)
+                for q in inside:
+                    block_of[q] = new_id
+
+                for c in range(n_symbols):
+                    if (y, c) in waiting or len(inside) <= len(blocks[y]):
+                        waiting.add((new_id, c))
+                    else:
+                        waiting.add((y, c))
+
+        return block_of
+
+    def __get_inverse(self) -> list[list[list[int]]]:
+        # inverse[a][t] lists the states reaching t consuming a. Missing
+        # transitions reach the dead state, whose id is the number of states
+        # and which loops on every symbol
+        inverse = self._cache.get("inverse")
+
+        if inverse is None:
+            tables = self.__get_tables()
+            dead = len(tables.states)
+            inverse = [[[] for _ in range(dead + 1)] for _ in tables.symbols]
+            for q, row in enumerate(tables.rows):
+                for a, t in enumerate(row):
+                    inverse[a][dead if t < 0 else t].append(q)
+            for inverse_a in inverse:
+                inverse_a[dead].append(dead)
+
+            self._cache["inverse"] = inverse
+
+        return inverse
+
+    def __get_reachable(self) -> list[int]:
+        # Ids of the states reachable from the initial state, in increasing
+        # order
+        reachable = self._cache.get("reachable")
+
+        if reachable is None:
+            tables = self.__get_tables()
+            seen = [False] * len(tables.states)
+            initial = tables.state_id[self.initial_state]
+            seen[initial] = True
+            stack = [initial]
+
+            while stack:
+                for t in tables.rows[stack.pop()]:
+                    if t >= 0 and not seen[t]:
+                        seen[t] = True
+                        stack.append(t)
+
+            reachable = [q for q, is_seen in enumerate(seen) if is_seen]
+            self._cache["reachable"] = reachable
+
+        return reachable
+
+    def __build_minimized(
+        self, tables: _DFATables, block_of: list[int], dead: int
+    ) -> "DFA":
+        symbols = tables.symbols
+        initial_block = block_of[tables.state_id[self.initial_state]]
+        dead_block = block_of[dead]
+        reachable = self.__get_reachable()
+
+        # A complete DFA stays complete, the dead state is kept as an
+        # explicit state, complement and the products rely on it. When the
+        # DFA is partial its transitions into the dead state are dropped
+        keep_dead = all(t >= 0 for q in reachable for t in tables.rows[q])
+
+        # Blocks are named in the order their first reachable state appears,
+        # that state is the representative whose row becomes the block's row
+        names: dict[int, str] = dict()
+        representatives: list[int] = []
+        f: set[str] = set()
 
-                    if not was_added:
-                        new_p_k.append({p_states_lst[i]})
+        for q in reachable:
+            block = block_of[q]
+            if block in names or (block == dead_block != initial_block):
+                continue
 
-            p_prev, p_k = p_k, set(map(lambda s: frozenset([*s]), new_p_k))
+            name = names[block] = f"q{len(names)}"
+            representatives.append(q)
 
-        states_idx: dict[str, int] = self.__states_idx_table(p_k)
-        initial_state = f"q{states_idx[self.initial_state]}"
-        final_states = set(list_map(lambda s: f"q{states_idx[s]}", self.f))
+            if tables.finals[q]:
+                f.add(name)
 
         delta: dict[str, dict[str, str]] = dict()
-        states = set(list_map(lambda idx: f"q{idx}", states_idx.values()))
+        dead_name = names.get(dead_block)
 
-        for state_group in p_k:
-            fst_state = list(state_group)[0]
+        for q in representatives:
+            row = tables.rows[q]
+            transitions = delta[names[block_of[q]]] = dict()
 
-            delta[f"q{states_idx[fst_state]}"] = dict()
+            for symbol, t in zip(symbols, row):
+                if t < 0:
+                    continue
 
-            for s in self.delta[fst_state]:
-                delta[f"q{states_idx[fst_state]}"][s] = (
-                    f"q{states_idx[self.delta[fst_state][s]]}"
-                )
+                if block_of[t] != dead_block:
+                    transitions[symbol] = names[block_of[t]]
+                elif keep_dead:
+                    # The dead state is named last, the first time it's used
+                    if dead_name is None:
+                        dead_name = names[dead_block] = f"q{len(names)}"
+                        delta[dead_name] = {s: dead_name for s in symbols}
+
+                    transitions[symbol] = dead_name
 
         return DFA(
-            states, self.sigma.copy(), delta, initial_state, final_states
+            frozenset(names.values()),
+            self.sigma,
+            delta,
+            names[initial_block],
+            f,
         )
 
-    def __states_idx_table(self, p_k: set[frozenset[str]]) -> dict[str, int]:
-        states_idx: dict[str, int] = dict()
+    def to_bytes(self) -> bytes:
+        """Returns the DFA packed in a compact binary format
 
-        for i in range(len(p_k)):
-            for state in list(p_k)[i]:
-                states_idx[state] = i
-
-        return states_idx
+        States and symbols are stored in sorted order, the transition table
+        as little-endian int32 ids with -1 for the missing transitions and
+        the final states as a bitmap. Use DFA.from_bytes to load it back.
+        The DFA must be valid.
+        """
+        self.is_valid()
+
+        tables = self.__get_tables()
+        n_states = len(tables.states)
+        n_symbols = len(tables.symbols)
+
+        packed = [
+            _PACKED_HEADER.pack(
+                _PACKED_MAGIC,
+                _PACKED_VERSION,
+                n_states,
+                n_symbols,
+                tables.state_id[self.initial_state],
+            )
+        ]
 
-    def __define_group_ith_element(
-        self,
-        i: int,
-        new_p_k: list[set[str]],
-        p_i_sigma: set[str],
-        p_states_lst: list[str],
-        states_idx: dict[str, int],
-    ) -> tuple[list[set[str]], bool]:
-        was_added = False
-        for new_p_states in new_p_k:
-            new_p_states_lst = list(new_p_states)
-            new_p_sigma = set(self.delta[new_p_states_lst[0]].keys())
-
-            if p_i_sigma != new_p_sigma:
-                continue
+        for name in chain(tables.states, tables.symbols):
+            encoded = name.encode("utf-8")
+            packed.append(_PACKED_LENGTH.pack(len(encoded)))
+            packed.append(encoded)
 
-            are_equivalent = all(
-                list_map(
-                    lambda s,
-                    p=p_states_lst[i],
-                    q=new_p_states_lst[0],
-                    table=states_idx,
-                    delta=self.delta: table[delta[p][s]] == table[delta[q][s]],
-                    p_i_sigma,
-                )
+        packed.append(
+            struct.pack(
+                f"<{n_states * n_symbols}i",
+                *chain.from_iterable(tables.rows),
             )
+        )
 
-            if are_equivalent:
-                new_p_states.add(p_states_lst[i])
-                was_added = True
-                break
+        bitmap = bytearray((n_states + 7) // 8)
+        for i, final in enumerate(tables.finals):
+            if final:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        packed.append(bytes(bitmap))
 
-        return new_p_k, was_added
+        return b"".join(packed)
 
-    def view(
-        self,
-        file_name: str,
-        node_attr: dict[str, str] | None = None,
-        edge_attr: dict[str, str] | None = None,
-    ) -> None:
-        dot = Digraph(
-            name=file_name,
-            format="png",
-            node_attr=node_attr,
-            edge_attr=edge_attr,
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DFA":
+        """Returns the DFA packed in data by DFA.to_bytes
+
+        Raises InputError if data isn't a DFA packed in this format.
+
+        Parameters
+        - - - - - - - - - - - - - - - - - -
+        data : bytes
+          Bytes-like object returned by DFA.to_bytes.
+        """
+        data = bytes(data)
+
+        if len(data) < _PACKED_HEADER.size:
+            raise InputError(len(data), "Too short to be a packed DFA")
+
+        magic, version, n_states, n_symbols, initial_id = (
+            _PACKED_HEADER.unpack_from(data)
         )
 
-        dot.graph_attr["rankdir"] = "LR"
+        if magic != _PACKED_MAGIC:
+            raise InputError(magic, "Is not the magic of a packed DFA")
+
+        if version != _PACKED_VERSION:
+            raise InputError(version, "Unsupported packed DFA version")
+
+        if initial_id >= n_states:
+            raise InputError(initial_id, "Initial state id out of range")
+
+        offset = _PACKED_HEADER.size
+        names = []
+
+        try:
+            for _ in range(n_states + n_symbols):
+                (length,) = _PACKED_LENGTH.unpack_from(data, offset)
+                offset += _PACKED_LENGTH.size
+                names.append(data[offset : offset + length].decode("utf-8"))
+                offset += length
 
-        dot.node("", "", shape="plaintext")
+            n_transitions = n_states * n_symbols
+            targets = struct.unpack_from(f"<{n_transitions}i", data, offset)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise InputError(offset, "Malformed packed DFA") from e
 
-        for f in self.f:
-            dot.node(f, f, shape="doublecircle")
+        offset += 4 * n_transitions
+        bitmap = data[offset:]
 
-        for q in self.q:
-            if q not in self.f:
-                dot.node(q, q, shape="circle")
+        if len(bitmap) != (n_states + 7) // 8:
+            raise InputError(len(bitmap), "Wrong size of the final states")
 
-        dot.edge("", self.initial_state, label="")
+        if any(t < -1 or t >= n_states for t in targets):
+            raise InputError(offset, "Transition to a state out of range")
 
-        for q in self.delta:
-            for s in self.delta[q]:
-                dot.edge(q, self.delta[q][s], label=s)
+        states = names[:n_states]
+        symbols = names[n_states:]
+
+        if len(set(states)) != n_states:
+            raise InputError(n_states, "Repeated state names")
+
+        if len(set(symbols)) != n_symbols:
+            raise InputError(n_symbols, "Repeated symbol names")
+
+        delta = {
+            state: {
+                s: states[t]
+                for s, t in zip(
+                    symbols, targets[i * n_symbols : (i + 1) * n_symbols]
+                )
+                if t >= 0
+            }
+            for i, state in enumerate(states)
+        }
+        f = {
+            state
+            for i, state in enumerate(states)
+            if bitmap[i >> 3] >> (i & 7) & 1
+        }
+
+        return cls(set(states), set(symbols), delta, states[initial_id], f)
+
+    def view(
+        self,
+        file_name: str,
+        node_attr: dict[str, str] | None = None,
+        edge_attr: dict[str, str] | None = None,
+    ) -> None:
+        source = dot_source(
+            file_name,
+            self.q,
+            self.f,
+            self.initial_state,
+            (
+                (q, destination, s)
+                for q, transitions in self.delta.items()
+                for s, destination in transitions.items()
+            ),
+            node_attr,
+            edge_attr,
+        )
 
-        dot.render()
+        render_dot(source, file_name)
@@ -4,14 +4,18 @@ from __future__ import (
 )
 from automathon.errors.errors import (
     SigmaError,
+    StateNotDeclaredError,
+    SymbolNotDeclaredError,
 )
 from automathon.finite_automata.dfa import (
     DFA,
 )
 from automathon.utils.utils import (
-    list_filter,
-    list_map,
-    flatten_list,
+    cache_field,
+    dot_source,
+    reduce_fields,
+    render_dot,
+    set_bits,
 )
 from collections import (
     deque,
@@ -19,12 +23,106 @@ from collections import (
 from dataclasses import (
     dataclass,
 )
-from graphviz import (
-    Digraph,
+from typing import (
+    Any,
+    Iterable,
 )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class _NFATables:
+    """Integer encoding of an NFA used by the simulation.
+
+    States are numbered in sorted order and sets of states are bitmasks of
+    those numbers. delta_bits[i][s] is the epsilon closure of the states
+    reached from state i consuming s, symbol_bits[s][i] is the same value
+    indexed by symbol first, 0 when there is no transition. trap_mask holds
+    the final states that loop on every symbol in symbol_bits.
+    """
+
+    states: list[str]
+    state_id: dict[str, int]
+    delta_bits: list[dict[str, int]]
+    symbol_bits: dict[str, list[int]]
+    e_closure: list[int]
+    f_mask: int
+    trap_mask: int
+
+
+def _reflexive_closures(successors: list[list[int]]) -> list[int]:
+    """Returns, for each id, the bitmask of the ids it reaches, itself included.
+
+    Tarjan's strongly connected components, run without recursion: every
+    component shares one mask, the OR of its members and of the masks of
+    the components it reaches, which are always finished first. Each edge
+    costs a single OR.
+    """
+    n = len(successors)
+    closure = [0] * n
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack: list[int] = []
+    counter = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+
+        # Frames are (id, position of the next successor to visit)
+        frames = [(root, 0)]
+
+        while frames:
+            v, k = frames.pop()
+            next_states = successors[v]
+
+            if k == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+                closure[v] = 1 << v
+            else:
+                # Back from the visit of next_states[k - 1]
+                w = next_states[k - 1]
+                if on_stack[w]:
+                    low[v] = min(low[v], low[w])
+                else:
+                    closure[v] |= closure[w]
+
+            while k < len(next_states):
+                w = next_states[k]
+                k += 1
+
+                if index[w] < 0:
+                    frames.append((v, k))
+                    frames.append((w, 0))
+                    break
+
+                if on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                else:
+                    closure[v] |= closure[w]
+            else:
+                if low[v] == index[v]:
+                    # v is the root of a component, pop it whole
+                    members = []
+                    mask = 0
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        members.append(w)
+                        mask |= closure[w]
+                        if w == v:
+                            break
+
+                    for w in members:
+                        closure[w] = mask
+
+    return closure
+
+
+@dataclass(slots=True)
 class NFA:
     """A Class used to represent a Non-Deterministic Finite Automaton
 
@@ -79,11 +177,14 @@ class NFA:
     accept(string : str) -> bool
         Returns True if the given string is accepted by the NFA
 
+    clear_cache() -> None
+        Drops the values computed from the NFA, after modifying it in place
+
     complement() -> NFA
         Returns the complement of the NFA
 
-    _get_e_closure(q : str, visited : list[str] | None) -> list[str]
-        Returns a list of the epsilon closures from estate q
+    _get_e_closure(q : str) -> frozenset[str]
+        Returns the (memoized) epsilon closure of state q
 
     _get_new_delta_real_value(
         delta : dict[str, dict[str, set[str]]], real_value : dict[str, str]
@@ -126,8 +227,28 @@ class NFA:
     delta: dict[str, dict[str, set[str]]]
     initial_state: str
     f: set[str]
+    # Values derived from the automaton, dropped whenever a field is reassigned
+    _cache: dict[str, Any] = cache_field()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+
+        cache = getattr(self, "_cache", None)
+        if cache and not name.startswith("_"):
+            cache.clear()
+
+    def __reduce__(self) -> tuple[type, tuple[Any, ...]]:
+        return reduce_fields(self)
+
+    def clear_cache(self) -> None:
+        """Drops everything computed from the NFA and kept for reuse
 
-    def accept(self, string: str) -> bool:
+        The cache is dropped when a field is reassigned, but not when q,
+        sigma, delta or f are modified in place, call this after doing so.
+        """
+        self._cache.clear()
+
+    def accept(self, string: str | bytes) -> bool:
         """
         Returns True if the given string is accepted by the NFA
 
@@ -137,8 +258,9 @@ class NFA:
 
         Parameters
         - - - - - - - - - - - - - - - - - -
-        string : str
-            A string that the NFA will try to process.
+        string : str | bytes
+            A string that the NFA will try to process. Bytes-like inputs are
+            read as latin-1 characters, one per byte.
 
         Returns
         - - - - - - - - - - - - - - - - - -
@@ -146,61 +268,117 @@ class NFA:
             True if the string is accepted by the NFA, False otherwise.
         """
 
-        def _add_pairs_to_queue(
-            q: deque[tuple[int, str]], pairs: list[tuple[int, str]]
-        ):
-            for pair in pairs:
-                q.append(pair)
+        # Basic Idea: Simulate the NFA over the set of states that are active
+        # after reading each character, as a bitmask of state ids
 
-        # Basic Idea: Search through states (delta) in the NFA, since the initial state to the final states
+        if not isinstance(string, str):
+            string = bytes(string).decode("latin-1")
 
-        # BFS states
+        tables = self.__get_tables()
+        symbol_bits = tables.symbol_bits
+        trap_mask = tables.trap_mask
 
-        q: deque[tuple[int, str]] = deque()
-        # queue -> states from i to last character in S | (index, state)
-        q.append([0, self.initial_state])  # Starts from 0
-        ans = False  # Flag
+        # A character without transitions empties the active states
+        if not symbol_bits.keys() >= set(string):
+            return False
 
-        while q and not ans:
-            front_q = q.popleft()
-            idx = front_q[0]
-            state = front_q[1]
+        current = tables.e_closure[tables.state_id[self.initial_state]]
 
-            if idx == len(string) and state in self.f:
-                ans = True
-            elif idx < len(string):
-                # Search through states
-                epsilon_transitions = filter(
-                    lambda x: x[0] == "", self.delta[state].items()
-                )
-                epsilon_pairs = flatten_list(
-                    list_map(
-                        lambda transition, idx=idx: list_map(
-                            lambda state: (idx, state), transition[1]
-                        ),
-                        epsilon_transitions,
-                    )
-                )
-                # Add epsilon transitions to the queue
-                _add_pairs_to_queue(q, epsilon_pairs)
+        for char in string:
+            # Once a final state looping on every symbol is active it stays
+            # active until the end of the string
+            if current & trap_mask:
+                return True
 
-                valid_transitions = list_filter(
-                    lambda x, idx=idx: x[0] == string[idx],
-                    self.delta[state].items(),
-                )
-                valid_pairs = flatten_list(
-                    list_map(
-                        lambda transition, idx=idx: list_map(
-                            lambda state, idx=idx: (idx + 1, state),
-                            transition[1],
-                        ),
-                        valid_transitions,
-                    )
-                )
-                # Add valid transitions to the queue
-                _add_pairs_to_queue(q, valid_pairs)
+            # The row of the character is looked up once for all the states
+            row = symbol_bits[char]
+            next_states = 0
+
+            while current:
+                low = current & -current
+                current ^= low
+                next_states |= row[low.bit_length() - 1]
+
+            if not next_states:
+                return False
+
+            current = next_states
+
+        return bool(current & tables.f_mask)
+
+    def __get_tables(self) -> _NFATables:
+        tables = self._cache.get("tables")
 
-        return ans
+        if tables is None:
+            tables = self._cache["tables"] = self.__build_tables()
+
+        return tables
+
+    def __build_tables(self) -> _NFATables:
+        states = sorted(
+            self.q
+            | self.delta.keys()
+            | {self.initial_state}
+            | {
+                state
+                for transitions in self.delta.values()
+                for next_states in transitions.values()
+                for state in next_states
+            }
+        )
+        state_id = {state: i for i, state in enumerate(states)}
+
+        def to_mask(states: Iterable[str]) -> int:
+            mask = 0
+            for state in states:
+                mask |= 1 << state_id[state]
+            return mask
+
+        epsilon: list[list[int]] = [[] for _ in states]
+
+        for state, transitions in self.delta.items():
+            epsilon[state_id[state]] = [
+                state_id[next_state] for next_state in transitions.get("", ())
+            ]
+
+        e_closure = _reflexive_closures(epsilon)
+
+        # Transitions land on the epsilon closure of their destinations
+        delta_bits: list[dict[str, int]] = [dict() for _ in states]
+
+        for state, transitions in self.delta.items():
+            row = delta_bits[state_id[state]]
+            for s, next_states in transitions.items():
+                if s == "":
+                    continue
+
+                mask = 0
+                for next_state in next_states:
+                    mask |= e_closure[state_id[next_state]]
+                row[s] = mask
+
+        symbol_bits: dict[str, list[int]] = dict()
+
+        for i, row in enumerate(delta_bits):
+            for s, mask in row.items():
+                symbol_bits.setdefault(s, [0] * len(states))[i] = mask
+
+        f_mask = to_mask(self.f & state_id.keys())
+        trap_mask = f_mask
+        for row in symbol_bits.values():
+            for i in set_bits(trap_mask):
+                if not row[i] >> i & 1:
+                    trap_mask ^= 1 << i
+
+        return _NFATables(
+            states,
+            state_id,
+            delta_bits,
+            symbol_bits,
+            e_closure,
+            f_mask,
+            trap_mask,
+        )
 
     def is_valid(self) -> bool:
         """
@@ -219,61 +397,56 @@ class NFA:
         Returns
         - - - - - - - - - - - - - - - - - -
         bool
-            True if the NFA is valid, Raises an exception otherwise.
+            True if the NFA is valid, Raises an exception otherwise. A
+            successful check is remembered until any of the NFA attributes
+            is reassigned.
         """
-        undeclared_states: set[str] | list[str] = set()
-
-        # Validate if the initial state is in the set Q
-        if self.initial_state not in self.q:
-            undeclared_states.add(self.initial_state)
-
-        undeclared_origin_states = set(
-            filter(lambda x: x != "" and x not in self.q, self.delta.keys())
-        )
+        if self._cache.get("valid"):
+            return True
+
+        destination_states = {
+            state
+            for transitions in self.delta.values()
+            for destination_set in transitions.values()
+            for state in destination_set
+        }
 
-        undeclared_sigma = list(
-            set(
-                filter(
-                    lambda s: s != "" and s not in self.sigma,
-                    [s for d in self.delta for s in self.delta[d]],
-                )
+        # Validate the states: initial state, origins, destinations and finals
+        for states in (
+            {self.initial_state},
+            self.delta.keys() - {""},
+            destination_states,
+            self.f,
+        ):
+            self.__raise_if_undeclared(
+                states, self.q, "Q", StateNotDeclaredError
             )
-        )
 
-        undeclared_destination_states = set(
-            filter(
-                lambda q: q not in self.q,
-                [
-                    q
-                    for d in self.delta
-                    for destination_set in self.delta[d].values()
-                    for q in destination_set
-                ],
-            )
+        symbols = {
+            s for transitions in self.delta.values() for s in transitions
+        }
+        self.__raise_if_undeclared(
+            symbols - {""}, self.sigma, "sigma", SymbolNotDeclaredError
         )
 
-        undeclared_final_states = set(filter(lambda f: f not in self.q, self.f))
-
-        undeclared_states = list(
-            undeclared_states
-            | undeclared_origin_states
-            | undeclared_destination_states
-            | undeclared_final_states
-        )
+        self._cache["valid"] = True
+        return True
 
-        if undeclared_states:
-            raise SigmaError(
-                undeclared_states,
-                f"{'are' if len(undeclared_states) > 1 else 'is'} not declared in Q",
-            )
+    def __raise_if_undeclared(
+        self,
+        values: set[str],
+        declared: set[str],
+        name: str,
+        error: type[SigmaError],
+    ) -> None:
+        # The subset check doesn't build a set when everything is declared
+        if values <= declared:
+            return
 
-        if undeclared_sigma:
-            raise SigmaError(
-                undeclared_sigma,
-                f"{'are' if len(undeclared_sigma) > 1 else 'is'} not declared in sigma",
-            )
+        undeclared = list(values - declared)
+        verb = "are" if len(undeclared) > 1 else "is"
 
-        return True
+        raise error(undeclared, f"{verb} not declared in {name}")
 
     def complement(self) -> "NFA":
         """
@@ -311,11 +484,17 @@ class NFA:
         - - - - - - - - - - - - - - - - - -
         bool
             True if the NFA contains epsilon transitions, False otherwise.
+            The answer is remembered until any of the NFA attributes is
+            reassigned.
         """
-        for q in self.delta:
-            if "" in self.delta[q]:
-                return True
-        return False
+        has_epsilon = self._cache.get("epsilon")
+
+        if has_epsilon is None:
+            has_epsilon = self._cache["epsilon"] = any(
+                "" in transitions for transitions in self.delta.values()
+            )
+
+        return has_epsilon
 
     def remove_epsilon_transitions(self) -> "NFA":
         """Returns a new NFA that is equivalent to the original NFA but without epsilon transitions.
@@ -343,80 +522,66 @@ class NFA:
         for q in q_prime:
             closure_states = self.__get_e_closure(q)
 
-            for sigma in self.sigma:
-                new_transitions = self.__ret_get_new_transitions(
-                    q, sigma, closure_states, delta_f
-                )
-                self.__ret_update_delta(delta_prime, q, sigma, new_transitions)
+            # q accepts if a final state is reachable by epsilon transitions
+            if not closure_states.isdisjoint(self.f):
+                delta_f.add(q)
+
+            # Each row is built whole, there is no need to guard its creation
+            delta_prime[q] = {
+                sigma: self.__ret_get_new_transitions(sigma, closure_states)
+                for sigma in self.sigma
+                if sigma != ""
+            }
 
         return NFA(q_prime, self.sigma, delta_prime, delta_init_state, delta_f)
 
-    def __get_e_closure(
-        self, q: str, visited: list[str] | None = None
-    ) -> list[str]:
+    def __get_e_closure(self, q: str) -> frozenset[str]:
         """
-        Returns a list of the epsilon closures from estate q.
+        Returns the epsilon closure of state q.
+
+        The closure of each state is computed once and memoized until any of
+        the NFA attributes is reassigned.
 
         Parameters
         - - - - - - - - - - - - - - - - - -
         q : str
             The state from which to start the search.
-        visited : list[str], optional
-            A list of already visited states. Defaults to None, in which case it is initialized as a list containing q.
 
         Returns
         - - - - - - - - - - - - - - - - - -
-        list[str]
-            A list of states reachable from q by following epsilon transitions.
+        frozenset[str]
+            The states reachable from q by following epsilon transitions.
         """
-        ans = [q]
-        if visited is None:
-            visited = list(q)
-
-        if q in self.delta and "" in self.delta[q]:
-            for st in self.delta[q][""]:
-                if st not in visited:
-                    visited.append(st)
-                    ans.extend([
-                        k
-                        for k in self.__get_e_closure(st, visited)
-                        if k not in ans
-                    ])
-        return ans
+        closures = self._cache.setdefault("e_closure", dict())
+        closure = closures.get(q)
+
+        if closure is None:
+            # Read back from the closure bitmasks of the integer tables
+            tables = self.__get_tables()
+            closure = closures[q] = frozenset(
+                map(
+                    tables.states.__getitem__,
+                    set_bits(tables.e_closure[tables.state_id[q]]),
+                )
+            )
+
+        return closure
 
     def __ret_get_new_transitions(
-        self, q: str, sigma: str, closure_states: list[str], delta_f: set[str]
-    ):
-        to_epsilon_closure: list[str] = []
-        new_transitions: list[str] = []
+        self,
+        sigma: str,
+        closure_states: frozenset[str],
+    ) -> set[str]:
+        to_epsilon_closure: set[str] = set()
 
         # Get the transitions from sigma in each epsilon closure
         for closure_state in closure_states:
-            if closure_state in self.f:
-                delta_f.add(q)
-            if (
-                closure_state in self.delta
-                and sigma in self.delta[closure_state]
-            ):
-                to_epsilon_closure.extend(self.delta[closure_state][sigma])
+            to_epsilon_closure.update(
+                self.delta.get(closure_state, {}).get(sigma, ())
+            )
 
         # Get the new transitions from the epsilon closure
-        for epsilon_closure in to_epsilon_closure:
-            new_transitions.extend(self.__get_e_closure(epsilon_closure))
-
-        return new_transitions
-
-    def __ret_update_delta(
-        self,
-        delta_prime: dict[str, dict[str, set[str]]],
-        q: str,
-        sigma: str,
-        new_transitions: list[str],
-    ):
-        if q not in delta_prime:
-            delta_prime[q] = dict()
-        if sigma != "":
-            delta_prime[q][sigma] = set(new_transitions)
+        return set().union(*map(self.__get_e_closure, to_epsilon_closure))
 
     def get_dfa(self) -> DFA:
         """
@@ -429,93 +594,98 @@ class NFA:
         Returns
         - - - - - - - - - - - - - - - - - -
         DFA
-            The DFA equivalent to the NFA.
+            The DFA equivalent to the NFA. The conversion is computed once and
+            reused until any of the NFA attributes is reassigned.
         """
+        dfa = self._cache.get("dfa")
 
-        local_nfa = NFA(
-            self.q, self.sigma, self.delta, self.initial_state, self.f
-        )
-        local_nfa = local_nfa.remove_epsilon_transitions()
+        if dfa is None:
+            dfa = self._cache["dfa"] = self.__build_dfa()
 
-        q_prime = []
-        delta_prime: dict[str, dict[str, str]] = dict()
+        return dfa
 
-        queue = deque()
-        visited = [[local_nfa.initial_state]]
-        queue.append([local_nfa.initial_state])
+    def __build_dfa(self) -> DFA:
+        tables = self.__get_tables()
+        states = tables.states
+        delta_bits = tables.delta_bits
 
-        while queue:
-            qs = queue.pop()  # state Q
+        def label_of(subset: int) -> str:
+            # States are numbered in sorted order, so the members come sorted
+            return str([states[i] for i in set_bits(subset)])
 
-            local_transitions: dict[str, str] | dict[str, list[str]] = (
-                dict()
-            )  # {str : list}
+        # Only the subsets reachable from the initial one are built, in BFS
+        # order, and each of them is labeled once, when it's discovered
+        initial_subset = tables.e_closure[tables.state_id[self.initial_state]]
+        labels: dict[int, str] = {initial_subset: label_of(initial_subset)}
+        delta_prime: dict[str, dict[str, str]] = dict()
+        f_prime: set[str] = set()
 
-            states_in_nfa_delta = filter(lambda q: q in local_nfa.delta, qs)
+        queue: deque[int] = deque()
+        queue.append(initial_subset)
 
-            for q in states_in_nfa_delta:
-                for s in local_nfa.delta[q]:
-                    tmp = local_nfa.delta[q][s].copy()
-                    self.__extend_local_transitions(tmp, s, local_transitions)
+        while queue:
+            subset = queue.popleft()
+            label = labels[subset]
+            local_transitions: dict[str, str] = dict()
 
-            self.__update_local_transitions(local_transitions, visited, queue)
+            if subset & tables.f_mask:
+                f_prime.add(label)
 
-            delta_prime[str(qs)] = local_transitions
-            q_prime.append(qs)
+            # OR the destination bitsets of every member, touching only the
+            # symbols the members actually have transitions on
+            moves: dict[str, int] = dict()
+            for i in set_bits(subset):
+                for symbol, mask in delta_bits[i].items():
+                    moves[symbol] = moves.get(symbol, 0) | mask
 
-        f_prime = set()
+            for symbol, next_subset in moves.items():
+                if not next_subset:
+                    continue
 
-        for qs in q_prime:
-            for q in qs:
-                if q in local_nfa.f:
-                    f_prime.add(str(qs))
-                    break
+                next_label = labels.get(next_subset)
 
-        aux = set()
+                if next_label is None:
+                    next_label = labels[next_subset] = label_of(next_subset)
+                    queue.append(next_subset)
 
-        for qs in q_prime:
-            aux.add(str(qs))
+                local_transitions[symbol] = next_label
 
-        q_prime = aux
+            delta_prime[label] = local_transitions
 
         return DFA(
-            q_prime,
-            local_nfa.sigma,
+            frozenset(labels.values()),
+            self.sigma,
             delta_prime,
-            str([local_nfa.initial_state]),
+            labels[initial_subset],
             f_prime,
         )
 
-    def __extend_local_transitions(
-        self, tmp: set[str], s: str, local_transitions: dict[str, list[str]]
-    ) -> None:
-        if tmp and s in local_transitions:
-            # avoid add repeated values
-            local_transitions[s].extend([
-                k for k in tmp if k not in local_transitions[s]
-            ])
-        elif tmp:
-            local_transitions[s] = list(tmp)
-
-    def __update_local_transitions(
-        self,
-        local_transitions: dict[str, list[str]],
-        visited: list[list[str]],
-        queue: deque,
-    ) -> None:
-        for transition in local_transitions:
-            local_transitions[transition] = sorted(
-                local_transitions[transition]
-            )
-            tmp = local_transitions[transition].copy()
-            if tmp not in visited:
-                queue.append(tmp)
-                visited.append(tmp)
-            local_transitions[transition] = str(local_transitions[transition])
+    def __as_dfa(self) -> DFA:
+        # get_dfa, unless the NFA is already deterministic, then its states
+        # are kept as they are and the subset construction is skipped
+        deterministic = not self.contains_epsilon_transitions() and all(
+            len(next_states) <= 1
+            for transitions in self.delta.values()
+            for next_states in transitions.values()
+        )
+
+        if not deterministic:
+            return self.get_dfa()
+
+        delta = {
+            state: {
+                s: next_state
+                for s, next_states in transitions.items()
+                for next_state in next_states
+            }
+            for state, transitions in self.delta.items()
+        }
+
+        return DFA(self.q, self.sigma, delta, self.initial_state, self.f)
 
     def minimize(self) -> "NFA":
         """Minimize the automata and return the NFA result of the minimization"""
-        local_dfa = self.get_dfa().minimize()
+        local_dfa = self.__as_dfa().minimize()
         local_nfa = local_dfa.get_nfa()
         local_nfa.renumber()
         return local_nfa
@@ -530,23 +700,23 @@ class NFA:
             Prefix for the renumbered state names.
         """
 
-        delta = dict()
-
         # Create new mappings for states
         new_tags = {state: f"{prefix}{idx}" for idx, state in enumerate(self.q)}
+        tag = new_tags.__getitem__
 
         # Update states
-        q = {new_tags[state] for state in self.q}
-        f = {new_tags[state] for state in self.f}
-        initial_state = new_tags[self.initial_state]
+        q = set(new_tags.values())
+        f = set(map(tag, self.f))
+        initial_state = tag(self.initial_state)
 
         # Update transitions
-        for _q in self.delta:
-            delta[new_tags[_q]] = dict()
-            for s in self.delta[_q]:
-                delta[new_tags[_q]][s] = {
-                    new_tags[nxt_state] for nxt_state in self.delta[_q][s]
-                }
+        delta = {
+            tag(_q): {
+                s: set(map(tag, next_states))
+                for s, next_states in transitions.items()
+            }
+            for _q, transitions in self.delta.items()
+        }
 
         self.q, self.f, self.delta, self.initial_state = (
             q,
@@ -558,37 +728,25 @@ class NFA:
     def union(self, m: "NFA") -> "NFA":
         """Given a NFA m returns the union automaton"""
         sigma = self.sigma.union(m.sigma)
-        q = set()
-        f = set()
         initial_state = "q0"
-        q.add(initial_state)
-        real_value_self = dict()
-        real_value_m = dict()
 
         # Fix possible errors when using the dictionaries with the name of the states
-        for i, _q in enumerate(self.q, 1):
-            real_value_self[_q] = "q{}".format(i)
-            q.add(real_value_self[_q])
+        real_value_self = {_q: f"q{i}" for i, _q in enumerate(self.q, 1)}
+        real_value_m = {s: f"s{i}" for i, s in enumerate(m.q)}
 
-        for i, s in enumerate(m.q):
-            real_value_m[s] = "s{}".format(i)
-            q.add(real_value_m[s])
-
-        for _q in self.f:
-            f.add(real_value_self[_q])
-
-        for _q in m.f:
-            f.add(real_value_m[_q])
+        q = {
+            initial_state,
+            *real_value_self.values(),
+            *real_value_m.values(),
+        }
+        f = {real_value_self[_q] for _q in self.f} | {
+            real_value_m[_q] for _q in m.f
+        }
 
         # Replace the values
-        self_delta = self.__get_new_delta_real_value(
-            self.delta, real_value_self
-        )
-        m_delta = self.__get_new_delta_real_value(m.delta, real_value_m)
-
         delta = {
-            **self_delta,
-            **m_delta,
+            **self.__get_new_delta_real_value(self.delta, real_value_self),
+            **self.__get_new_delta_real_value(m.delta, real_value_m),
             initial_state: {
                 "": {
                     real_value_self[self.initial_state],
@@ -602,17 +760,13 @@ class NFA:
     def __get_new_delta_real_value(
         self, delta: dict[str, dict[str, set[str]]], real_value: dict[str, str]
     ) -> dict[str, dict[str, set[str]]]:
-        new_delta = dict()
-        for q, transition in delta.items():
-            tmp_dict = dict()
-            for s, states in transition.items():
-                tmp_states = []
-                for state in states:
-                    tmp_states.append(real_value[state])
-
-                tmp_dict[s] = set(tmp_states.copy())
-            new_delta[real_value[q]] = tmp_dict.copy()
-        return new_delta
+        return {
+            real_value[q]: {
+                s: {real_value[state] for state in states}
+                for s, states in transition.items()
+            }
+            for q, transition in delta.items()
+        }
 
     def intersection(self, m: "NFA") -> "NFA":
         """Given a NFA m returns the intersection automaton"""
@@ -622,55 +776,48 @@ class NFA:
                 "The alphabet of the two automata must be the same",
             )
 
-        new_q_list: list[tuple[str, str]] = []
-
-        initial_state = str((self.initial_state, m.initial_state))
         delta: dict[str, dict[str, set[str]]] = dict()
         f: set[str] = set()
         sigma = self.sigma.copy()
 
-        queue = deque()
-        queue.append((self.initial_state, m.initial_state))
+        # Every pair is named as soon as it's discovered, so it's queued and
+        # converted to a string only once
+        initial_pair = (self.initial_state, m.initial_state)
+        names: dict[tuple[str, str], str] = {initial_pair: str(initial_pair)}
+        queue = deque([initial_pair])
 
         while queue:
-            a, b = queue.popleft()
-
-            new_q_list.append((a, b))
+            a, b = pair = queue.popleft()
+            name = names[pair]
 
             if a in self.f and b in m.f:
-                f.add(str((a, b)))
-
-            common_transitions = self.delta[a].keys() & m.delta[b].keys()
-
-            for s in common_transitions:
-                a_next_states = self.delta[a][s].copy()
-                b_next_states = m.delta[b][s].copy()
+                f.add(name)
 
-                next_states: set[str] = {
-                    (x, y) for x in a_next_states for y in b_next_states
-                }
-
-                unexplored_states = set(
-                    filter(lambda x: x not in new_q_list, next_states)
-                )
+            delta_a = self.delta.get(a, {})
+            delta_b = m.delta.get(b, {})
+            transitions: dict[str, set[str]] = dict()
 
-                new_q_list.extend(unexplored_states)
+            for s in delta_a.keys() & delta_b.keys():
+                next_states = {(x, y) for x in delta_a[s] for y in delta_b[s]}
 
-                for x, y in unexplored_states:
-                    queue.append((x, y))
+                for next_pair in next_states:
+                    if next_pair not in names:
+                        names[next_pair] = str(next_pair)
+                        queue.append(next_pair)
 
-                if str((a, b)) not in delta:
-                    delta[str((a, b))] = dict()
+                transitions[s] = {names[next_pair] for next_pair in next_states}
 
-                delta[str((a, b))][s] = set(map(str, next_states))
+            # Pairs without common symbols get no row
+            if transitions:
+                delta[name] = transitions
 
-        return NFA(set(map(str, new_q_list)), sigma, delta, initial_state, f)
+        return NFA(set(names.values()), sigma, delta, names[initial_pair], f)
 
     def product(self, m: "NFA") -> "NFA":
         """Given a DFA M returns the product automaton"""
         # Using DFA conversion
-        a = self.get_dfa()
-        b = m.get_dfa()
+        a = self.__as_dfa()
+        b = m.__as_dfa()
 
         nfa = a.product(b).get_nfa()
 
@@ -682,32 +829,19 @@ class NFA:
         node_attr: dict[str, str] | None = None,
         edge_attr: dict[str, str] | None = None,
     ) -> None:
-        dot = Digraph(
-            name=file_name,
-            format="png",
-            node_attr=node_attr,
-            edge_attr=edge_attr,
+        source = dot_source(
+            file_name,
+            self.q,
+            self.f,
+            self.initial_state,
+            (
+                (q, destination, s or "ε")
+                for q, transitions in self.delta.items()
+                for s, destinations in transitions.items()
+                for destination in destinations
+            ),
+            node_attr,
+            edge_attr,
         )
 
-        dot.graph_attr["rankdir"] = "LR"
-
-        dot.node("", "", shape="plaintext")
-
-        for _f in self.f:
-            dot.node(_f, _f, shape="doublecircle")
-
-        for _q in self.q:
-            if _q not in self.f:
-                dot.node(_q, _q, shape="circle")
-
-        dot.edge("", self.initial_state, label="")
-
-        for q in self.delta:
-            for s in self.delta[q]:
-                for t in self.delta[q][s]:
-                    if s == "":
-                        dot.edge(q, t, label="ε")
-                    else:
-                        dot.edge(q, t, label=s)
-
-        dot.render()
+        render_dot(source, file_name)
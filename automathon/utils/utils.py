@@ -1,4 +1,16 @@
+from __future__ import (
+    annotations,
+)
+from dataclasses import (
+    field,
+    fields,
+)
+from itertools import (
+    chain,
+)
 from typing import (
+    AbstractSet,
+    Any,
     Callable,
     TypeVar,
     Iterable,
@@ -16,5 +28,90 @@ def list_filter(function: Callable[[_A], bool], iter: Iterable[_A]) -> list[_A]:
     return list(filter(function, iter))
 
 
-def flatten_list(lst: list[list[_A]]) -> list[_A]:
-    return sum(lst, [])
+def flatten_list(lst: Iterable[Iterable[_A]]) -> list[_A]:
+    return list(chain.from_iterable(lst))
+
+
+def set_bits(mask: int) -> list[int]:
+    bits = []
+
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+
+    return bits
+
+
+def dot_quote(value: str) -> str:
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def dot_source(
+    name: str,
+    q: AbstractSet[str],
+    f: AbstractSet[str],
+    initial_state: str,
+    edges: Iterable[tuple[str, str, str]],
+    node_attr: dict[str, str] | None = None,
+    edge_attr: dict[str, str] | None = None,
+) -> str:
+    """Returns the DOT source of an automaton drawn from left to right.
+
+    Each edge is a (origin, destination, label) tuple, edges between the same
+    pair of states are merged into one. The source is built in a single join
+    instead of one graphviz call per node and edge.
+    """
+    lines = [f"digraph {dot_quote(name)} {{", "\tgraph [rankdir=LR]"]
+
+    for kind, attrs in (("node", node_attr), ("edge", edge_attr)):
+        if attrs:
+            attr_list = " ".join(
+                f"{key}={dot_quote(value)}" for key, value in attrs.items()
+            )
+            lines.append(f"\t{kind} [{attr_list}]")
+
+    lines.append('\t"" [label="" shape=plaintext]')
+    lines.extend(f"\t{dot_quote(s)} [shape=doublecircle]" for s in f)
+    lines.extend(f"\t{dot_quote(s)} [shape=circle]" for s in q - f)
+    lines.append(f'\t"" -> {dot_quote(initial_state)} [label=""]')
+
+    # Parallel edges are drawn once, with their labels joined
+    labels: dict[tuple[str, str], list[str]] = dict()
+    for origin, destination, label in edges:
+        labels.setdefault((origin, destination), []).append(label)
+
+    lines.extend(
+        f"\t{dot_quote(origin)} -> {dot_quote(destination)}"
+        f" [label={dot_quote(', '.join(edge_labels))}]"
+        for (origin, destination), edge_labels in labels.items()
+    )
+    lines.append("}")
+
+    return "\n".join(lines)
+
+
+def cache_field() -> Any:
+    """Returns the field where an automaton keeps the values it computes
+    from its other fields, left out of __init__, repr and comparisons."""
+    return field(default_factory=dict, init=False, repr=False, compare=False)
+
+
+def reduce_fields(automaton: Any) -> tuple[type, tuple[Any, ...]]:
+    """Returns the __reduce__ value of an automaton dataclass.
+
+    Copies and pickles are built again from the fields passed to __init__,
+    leaving the cache field out. It's __reduce__ rather than __getstate__
+    since dataclass replaces the latter on frozen slotted classes in 3.10.
+    """
+    return type(automaton), tuple(
+        getattr(automaton, f.name) for f in fields(automaton) if f.init
+    )
+
+
+def render_dot(source: str, file_name: str) -> None:
+    """Renders the DOT source to file_name.gv and file_name.gv.png."""
+    # graphviz is only needed to render, it's imported on the first call
+    from graphviz import Source
+
+    Source(source, filename=f"{file_name}.gv", format="png").render()
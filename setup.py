@@ -23,6 +23,7 @@ setup(
     long_description_content_type="text/markdown",
     author="Robin Hafid Quintero Lopez",
     license="MIT",
+    python_requires=">=3.10",
     install_requires=["graphviz==0.16"],
     tests_require=["graphviz==0.16"],
     test_suite="tests",
@@ -1,5 +1,12 @@
+import copy
+import pickle
 import unittest
 from automathon import DFA
+from automathon.errors.errors import (
+    InputError,
+    StateNotDeclaredError,
+    SymbolNotDeclaredError,
+)
 
 
 class TestDFA(unittest.TestCase):
@@ -55,6 +62,35 @@ class TestDFA(unittest.TestCase):
     def test_is_valid(self):
         self.assertTrue(self.fa.is_valid())
 
+    def test_is_valid_undeclared(self):
+        undeclared_destination = DFA(
+            q={"q0"},
+            sigma={"0"},
+            delta={"q0": {"0": "q1"}},
+            initial_state="q0",
+            f={"q0"},
+        )
+        undeclared_symbol = DFA(
+            q={"q0"},
+            sigma={"0"},
+            delta={"q0": {"1": "q0"}},
+            initial_state="q0",
+            f={"q0"},
+        )
+        undeclared_final = DFA(
+            q={"q0"},
+            sigma={"0"},
+            delta={"q0": {"0": "q0"}},
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertRaises(
+            StateNotDeclaredError, undeclared_destination.is_valid
+        )
+        self.assertRaises(SymbolNotDeclaredError, undeclared_symbol.is_valid)
+        self.assertRaises(StateNotDeclaredError, undeclared_final.is_valid)
+
     def test_accept_empty(self):
         self.assertTrue(self.fa.accept(""))
 
@@ -64,6 +100,73 @@ class TestDFA(unittest.TestCase):
     def test_accept_str_2(self):
         self.assertTrue(self.fa.accept("0101010101010"))
 
+    def test_accept_bytes(self):
+        self.assertTrue(self.fa.accept(b"001001"))
+        self.assertTrue(self.fa.accept(memoryview(b"0101010101010")))
+        self.assertFalse(self.fa.accept(b"0012"))
+
+    def test_accept_many(self):
+        self.assertEqual(
+            [True, False, True, False],
+            self.fa.accept_many(["001001", "00100", b"", "0012"]),
+        )
+
+    def test_accept_sink(self):
+        fa = DFA(
+            q={"q0", "q1", "q2"},
+            sigma={"a", "b", "c"},
+            delta={
+                "q0": {"a": "q1", "b": "q2", "c": "q0"},
+                "q1": {"a": "q1", "b": "q1"},
+                "q2": {"a": "q2", "b": "q2", "c": "q2"},
+            },
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertTrue(fa.accept("ca" + "ab" * 100))
+        self.assertTrue(fa.accept(b"ca" + b"ab" * 100))
+        self.assertFalse(fa.accept("ca" + "ab" * 100 + "c"))
+        self.assertFalse(fa.accept(b"cab" + b"c" + b"ab" * 100))
+        self.assertFalse(fa.accept("b" + "ab" * 100))
+
+    def test_clear_cache(self):
+        fa = DFA(
+            q={"q0", "q1"},
+            sigma={"0", "1"},
+            delta={"q0": {"0": "q0", "1": "q1"}, "q1": {"0": "q1"}},
+            initial_state="q0",
+            f={"q0"},
+        )
+
+        self.assertFalse(fa.accept("1"))
+        self.assertFalse(fa.accept("1"))
+
+        fa.delta["q0"]["1"] = "q0"
+        fa.clear_cache()
+
+        self.assertTrue(fa.accept("1"))
+
+    def test_copy_leaves_cache_out(self):
+        fa = DFA(
+            q={"q0", "q1"},
+            sigma={"0", "1"},
+            delta={"q0": {"0": "q0", "1": "q1"}, "q1": {"0": "q1"}},
+            initial_state="q0",
+            f={"q0"},
+        )
+
+        self.assertFalse(fa.accept("1"))
+        self.assertTrue(fa.accept("0" * 1000))
+
+        loaded_fa = pickle.loads(pickle.dumps(fa))
+        fa_copy = copy.deepcopy(fa)
+        fa_copy.delta["q0"]["1"] = "q0"
+
+        self.assertEqual(loaded_fa, fa)
+        self.assertFalse(loaded_fa.accept("1"))
+        self.assertTrue(fa_copy.accept("1"))
+
     def test_complement(self):
         not_fa = self.fa.complement()
         self.assertFalse(not_fa.accept("001001"))
@@ -92,6 +195,96 @@ class TestDFA(unittest.TestCase):
         self.assertTrue(product_result.accept("bb"))
         self.assertFalse(product_result.accept("b"))
 
+    def test_product_reachable(self):
+        dfa = DFA(
+            q={"A", "B", "X"},
+            sigma={"a", "b"},
+            delta={"A": {"a": "B"}, "B": {"b": "A"}, "X": {"a": "X"}},
+            initial_state="A",
+            f={"A"},
+        )
+
+        dfa_1 = DFA(
+            q={"C", "D"},
+            sigma={"a", "b"},
+            delta={"C": {"a": "D", "b": "C"}, "D": {"a": "C", "b": "D"}},
+            initial_state="C",
+            f={"C"},
+        )
+
+        product_result = dfa.product(dfa_1)
+
+        self.assertTrue(product_result.is_valid())
+        self.assertEqual({"q0", "q1", "q2", "q3"}, product_result.q)
+        self.assertEqual("q0", product_result.initial_state)
+        self.assertTrue(product_result.accept(""))
+        self.assertTrue(product_result.accept("abab"))
+        self.assertFalse(product_result.accept("ab"))
+        self.assertFalse(product_result.accept("aa"))
+
+    def test_product_cache(self):
+        dfa = DFA(
+            q={"A", "B"},
+            sigma={"0", "1"},
+            delta={"A": {"0": "B", "1": "A"}, "B": {"0": "A", "1": "B"}},
+            initial_state="A",
+            f={"A"},
+        )
+        dfa_copy = DFA(
+            q={"A", "B"},
+            sigma={"0", "1"},
+            delta={"A": {"0": "B", "1": "A"}, "B": {"0": "A", "1": "B"}},
+            initial_state="A",
+            f={"A"},
+        )
+
+        union_result = dfa.union(self.dfa_1)
+        intersection_result = dfa.intersection(self.dfa_1)
+
+        self.assertEqual(union_result.delta, intersection_result.delta)
+        self.assertIsNot(union_result.delta, intersection_result.delta)
+
+        # Results are never shared, editing one doesn't change the others
+        union_result.delta["q0"]["0"] = "q0"
+        union_result.clear_cache()
+
+        self.assertIsNot(union_result, dfa_copy.union(self.dfa_1))
+        self.assertFalse(dfa_copy.union(self.dfa_1).accept("0"))
+
+        # The pairs explored before aren't reused once the cache is cleared
+        dfa_copy.delta["A"]["0"] = "A"
+        dfa_copy.clear_cache()
+
+        self.assertTrue(dfa_copy.union(self.dfa_1).accept("0"))
+
+        DFA.clear_product_cache()
+
+        self.assertFalse(dfa.union(self.dfa_1).accept("0"))
+
+    def test_product_pairs_reused(self):
+        dfa = DFA(
+            q={"A", "B"},
+            sigma={"0", "1"},
+            delta={"A": {"0": "B", "1": "A"}, "B": {"0": "A", "1": "B"}},
+            initial_state="A",
+            f={"A"},
+        )
+
+        union_result = dfa.union(self.dfa_1)
+
+        # Operations over the same DFAs share the pairs explored once
+        self.assertIs(union_result.q, dfa.difference(self.dfa_1).q)
+
+        dfa.clear_cache()
+        difference_result = dfa.difference(self.dfa_1)
+
+        self.assertIsNot(union_result.q, difference_result.q)
+        self.assertEqual(union_result.q, difference_result.q)
+
+        DFA.clear_product_cache()
+
+        self.assertIsNot(difference_result.q, dfa.union(self.dfa_1).q)
+
     def test_product_1(self):
         product_result = self.dfa.product(self.dfa_1)
 
@@ -155,6 +348,7 @@ class TestDFA(unittest.TestCase):
 
         self.assertTrue(minimized_dfa.is_valid())
         self.assertGreaterEqual(len(dfa.q), len(minimized_dfa.q))
+        self.assertIs(minimized_dfa, dfa.minimize())
 
     def test_minimize_2(self):
         fa = DFA(
@@ -181,6 +375,73 @@ class TestDFA(unittest.TestCase):
         self.assertEqual(fa.accept("01"), minimized_fa.accept("01"))
         self.assertEqual(fa.accept("0101"), minimized_fa.accept("0101"))
 
+    def test_minimize_sparse(self):
+        fa = DFA(
+            q={"q0", "q1", "q2", "q3", "q4"},
+            sigma={"a", "b", "c", "d", "e", "f"},
+            delta={
+                "q0": {"a": "q1", "b": "q2", "c": "q4"},
+                "q1": {"f": "q3"},
+                "q2": {"f": "q3"},
+                "q4": {"d": "q4"},
+            },
+            initial_state="q0",
+            f={"q3"},
+        )
+        minimized_fa = fa.minimize()
+
+        self.assertTrue(minimized_fa.is_valid())
+        self.assertEqual(3, len(minimized_fa.q))
+        self.assertTrue(minimized_fa.accept("af"))
+        self.assertTrue(minimized_fa.accept("bf"))
+        self.assertFalse(minimized_fa.accept("cd"))
+        self.assertFalse(minimized_fa.accept("a"))
+
+    def test_minimize_unreachable(self):
+        fa = DFA(
+            q={"q0", "q1", "q2"},
+            sigma={"0", "1"},
+            delta={
+                "q0": {"0": "q1", "1": "q0"},
+                "q1": {"0": "q0", "1": "q1"},
+                "q2": {"0": "q2", "1": "q2"},
+            },
+            initial_state="q0",
+            f={"q0", "q2"},
+        )
+        minimized_fa = fa.minimize()
+
+        self.assertTrue(minimized_fa.is_valid())
+        self.assertEqual({"q0", "q1"}, minimized_fa.q)
+        self.assertTrue(minimized_fa.accept("00"))
+        self.assertFalse(minimized_fa.accept("01"))
+
+    def test_minimize_complement(self):
+        fa = DFA(
+            q={"A", "B", "D"},
+            sigma={"0", "1"},
+            delta={
+                "A": {"0": "B", "1": "D"},
+                "B": {"0": "B", "1": "B"},
+                "D": {"0": "D", "1": "D"},
+            },
+            initial_state="A",
+            f={"B"},
+        )
+        minimized_fa = fa.minimize()
+        universal = DFA(
+            q={"S"},
+            sigma={"0", "1"},
+            delta={"S": {"0": "S", "1": "S"}},
+            initial_state="S",
+            f={"S"},
+        )
+
+        self.assertEqual(3, len(minimized_fa.q))
+        self.assertTrue(minimized_fa.complement().accept("1"))
+        self.assertFalse(minimized_fa.complement().accept("0"))
+        self.assertTrue(universal.difference(minimized_fa).accept("1"))
+
     def test_minimize_existing_1(self):
         fa = DFA(
             q={"q0", "q1", "q2"},
@@ -209,6 +470,67 @@ class TestDFA(unittest.TestCase):
         self.assertFalse(not_minimized_fa.accept("001001"))
         self.assertFalse(not_minimized_fa.accept("0101010101010"))
 
+    def test_minimize_partial(self):
+        fa = DFA(
+            q={"q0", "q1", "q2", "q3"},
+            sigma={"a", "b"},
+            delta={
+                "q0": {"a": "q1", "b": "q2"},
+                "q1": {"a": "q3"},
+                "q2": {"a": "q3"},
+                "q3": {},
+            },
+            initial_state="q0",
+            f={"q3"},
+        )
+        minimized_fa = fa.minimize()
+
+        self.assertTrue(minimized_fa.is_valid())
+        self.assertEqual(3, len(minimized_fa.q))
+        self.assertTrue(minimized_fa.accept("aa"))
+        self.assertTrue(minimized_fa.accept("ba"))
+        self.assertFalse(minimized_fa.accept("ab"))
+        self.assertFalse(minimized_fa.accept("aaa"))
+
+    def test_to_bytes(self):
+        fa = DFA(
+            q={"q0", "q1", "q2"},
+            sigma={"a", "b"},
+            delta={"q0": {"a": "q1"}, "q1": {"a": "q2", "b": "q0"}, "q2": {}},
+            initial_state="q0",
+            f={"q2"},
+        )
+        loaded_fa = DFA.from_bytes(fa.to_bytes())
+
+        self.assertEqual(fa.q, loaded_fa.q)
+        self.assertEqual(fa.sigma, loaded_fa.sigma)
+        self.assertEqual(fa.delta, loaded_fa.delta)
+        self.assertEqual(fa.initial_state, loaded_fa.initial_state)
+        self.assertEqual(fa.f, loaded_fa.f)
+
+    def test_from_bytes_malformed(self):
+        packed = self.fa.to_bytes()
+
+        self.assertRaises(InputError, DFA.from_bytes, packed[:-1])
+        self.assertRaises(InputError, DFA.from_bytes, b"NOPE" + packed[4:])
+
+    def test_from_bytes_repeated_names(self):
+        fa = DFA(
+            q={"q0", "q1"},
+            sigma={"a", "b"},
+            delta={"q0": {"a": "q1"}, "q1": {"b": "q0"}},
+            initial_state="q0",
+            f={"q1"},
+        )
+        packed = fa.to_bytes()
+
+        self.assertRaises(
+            InputError, DFA.from_bytes, packed.replace(b"q1", b"q0")
+        )
+        self.assertRaises(
+            InputError, DFA.from_bytes, packed.replace(b"b", b"a")
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
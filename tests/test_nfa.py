@@ -1,5 +1,10 @@
+import copy
 import unittest
 from automathon import NFA
+from automathon.errors.errors import (
+    StateNotDeclaredError,
+    SymbolNotDeclaredError,
+)
 
 
 class TestNFA(unittest.TestCase):
@@ -37,6 +42,25 @@ class TestNFA(unittest.TestCase):
     def test_isValid(self):
         self.assertTrue(self.fa.is_valid())
 
+    def test_isValid_undeclared_transitions(self):
+        undeclared_state = NFA(
+            q={"q0", "q1"},
+            sigma={"a"},
+            delta={"q0": {"a": {"q1", "q2"}}},
+            initial_state="q0",
+            f={"q1"},
+        )
+        undeclared_symbol = NFA(
+            q={"q0", "q1"},
+            sigma={"a"},
+            delta={"q0": {"b": {"q1"}}},
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertRaises(StateNotDeclaredError, undeclared_state.is_valid)
+        self.assertRaises(SymbolNotDeclaredError, undeclared_symbol.is_valid)
+
     def test_accept_str_1(self):
         self.assertTrue(self.fa.accept("000001100001"))
 
@@ -46,6 +70,39 @@ class TestNFA(unittest.TestCase):
     def test_accept_str_3(self):
         self.assertFalse(self.fa.accept("000001"))
 
+    def test_accept_bytes(self):
+        self.assertTrue(self.fa.accept(b"0000011"))
+        self.assertFalse(self.fa.accept(bytearray(b"000001")))
+
+    def test_accept_epsilon_after_last_symbol(self):
+        nfa = NFA(
+            q={"q0", "q1", "q2"},
+            sigma={"a"},
+            delta={"q0": {"a": {"q1"}}, "q1": {"": {"q2"}}},
+            initial_state="q0",
+            f={"q2"},
+        )
+
+        self.assertTrue(nfa.accept("a"))
+        self.assertFalse(nfa.accept(""))
+        self.assertFalse(nfa.accept("aa"))
+
+    def test_accept_final_trap(self):
+        nfa = NFA(
+            q={"q0", "q1"},
+            sigma={"a", "b"},
+            delta={
+                "q0": {"a": {"q0", "q1"}, "b": {"q0"}},
+                "q1": {"a": {"q1"}, "b": {"q1"}},
+            },
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertTrue(nfa.accept("ba" + "ab" * 100))
+        self.assertFalse(nfa.accept("bbbb"))
+        self.assertFalse(nfa.accept("ba" + "ab" * 100 + "c"))
+
     def test_remove_epsilon_transitions_1(self):
         no_epsilon_transitions = self.fa_1.remove_epsilon_transitions()
         self.assertTrue(no_epsilon_transitions.is_valid())
@@ -58,6 +115,61 @@ class TestNFA(unittest.TestCase):
         dfa = self.fa.get_dfa()
         self.assertTrue(dfa.accept("0000011"))
 
+    def test_clear_cache(self):
+        nfa = NFA(
+            q={"q0", "q1"},
+            sigma={"a"},
+            delta={"q0": {"a": {"q0"}}},
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertFalse(nfa.accept("a"))
+        self.assertFalse(nfa.get_dfa().accept("a"))
+
+        nfa_copy = copy.deepcopy(nfa)
+        nfa_copy.delta["q0"]["a"].add("q1")
+
+        self.assertTrue(nfa_copy.accept("a"))
+
+        nfa.delta["q0"]["a"].add("q1")
+        nfa.clear_cache()
+
+        self.assertTrue(nfa.accept("a"))
+        self.assertTrue(nfa.get_dfa().accept("a"))
+
+    def test_contains_epsilon_transitions(self):
+        nfa = NFA(
+            q={"q0", "q1"},
+            sigma={"a"},
+            delta={"q0": {"a": {"q1"}}},
+            initial_state="q0",
+            f={"q1"},
+        )
+
+        self.assertFalse(nfa.contains_epsilon_transitions())
+
+        nfa.delta = {"q0": {"": {"q1"}}}
+
+        self.assertTrue(nfa.contains_epsilon_transitions())
+
+    def test_get_dfa_cached(self):
+        nfa = NFA(
+            q={"q0", "q1"},
+            sigma={"a"},
+            delta={"q0": {"a": {"q0", "q1"}}},
+            initial_state="q0",
+            f={"q1"},
+        )
+        dfa = nfa.get_dfa()
+
+        self.assertIs(dfa, nfa.get_dfa())
+
+        nfa.renumber()
+
+        self.assertIsNot(dfa, nfa.get_dfa())
+        self.assertTrue(nfa.get_dfa().accept("aa"))
+
     def test_nfa_dfa_1(self):
         dfa = self.fa_1.get_dfa()
         self.assertTrue(dfa.is_valid())